@@ -12,7 +12,7 @@ __author__ = "Aaron Sequeira"
 
 # Package-level imports for convenience
 from .app import app
-from .models import SearchRequest, SearchResponse, ChunkResult
+from .models import SearchRequest, SearchResponse, SearchResultItem
 from .vector_store import VectorStore
 from .chunking import TextChunker
 from .html_utils import fetch_and_clean_html
@@ -21,7 +21,7 @@ __all__ = [
     "app",
     "SearchRequest",
     "SearchResponse",
-    "ChunkResult",
+    "SearchResultItem",
     "VectorStore",
     "TextChunker",
     "fetch_and_clean_html",
@@ -1,13 +1,33 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from models import SearchRequest, SearchResponse, ErrorResponse
-from html_utils import fetch_and_clean_html
-from chunking import TextChunker
-from vector_store import VectorStore
+try:
+    from .models import SearchRequest, SearchResponse, SearchResultItem, ChunkData, ErrorResponse
+    from .html_utils import fetch_and_clean_html, create_http_client
+    from .chunking import TextChunker
+    from .vector_store import VectorStore, search_embeddings
+    from .cache import EmbeddingCache, SemanticQueryCache, content_hash, dequantize_int8
+except ImportError:
+    # Run from inside backend/ (python app.py, uvicorn app:app, pytest)
+    if __package__:
+        raise
+    from models import SearchRequest, SearchResponse, SearchResultItem, ChunkData, ErrorResponse
+    from html_utils import fetch_and_clean_html, create_http_client
+    from chunking import TextChunker
+    from vector_store import VectorStore, search_embeddings
+    from cache import EmbeddingCache, SemanticQueryCache, content_hash, dequantize_int8
+import asyncio
 import logging
 import os
+import tempfile
+import torch
 from dotenv import load_dotenv
 
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, where workers are never pinned
+    fcntl = None
+
 # Load environment variables
 load_dotenv()
 
@@ -21,26 +41,94 @@ app = FastAPI(
     version="2.0.0"
 )
 
-# Configure CORS - Allow requests from frontend
+# Configure CORS - Allow requests from frontend, resolved once at import
+ALLOWED_ORIGINS = {"http://localhost:3000", os.getenv('FRONTEND_URL', 'http://localhost:3000')}
+
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=[
-        "http://localhost:3000",
-        os.getenv('FRONTEND_URL', 'http://localhost:3000')
-    ],
+    allow_origins=sorted(ALLOWED_ORIGINS),
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+# Pages with fewer chunks are searched in memory by brute force; larger ones are
+# queried through Qdrant's HNSW index, where search cost grows logarithmically
+IN_MEMORY_SEARCH_MAX_CHUNKS = int(os.getenv('IN_MEMORY_SEARCH_MAX_CHUNKS', '2000'))
+
 # Initialize components
 chunker = TextChunker(max_tokens=500, overlap_tokens=50)
+embedding_cache = EmbeddingCache(
+    max_entries=int(os.getenv('EMBEDDING_CACHE_SIZE', '128')),
+    cache_dir=os.getenv('EMBEDDING_CACHE_DIR'),
+    quantize=os.getenv('EMBEDDING_CACHE_INT8', 'false').lower() == 'true'
+)
+query_cache = SemanticQueryCache(
+    threshold=float(os.getenv('QUERY_CACHE_THRESHOLD', '0.97')),
+    max_pages=int(os.getenv('QUERY_CACHE_SIZE', '1024')),
+    entries_per_page=int(os.getenv('QUERY_CACHE_ENTRIES_PER_PAGE', '32'))
+)
 vector_store = None
 
+# Lock on the core claimed by this worker, held for the life of the process
+_cpu_lock_file = None
+
+def allowed_cpus() -> list:
+    """CPUs this process may run on, honouring container cpusets"""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def pin_worker_cpu() -> None:
+    """Pin this worker process to a free allowed core and size torch's thread pool to match"""
+    global _cpu_lock_file
+    if fcntl is None or not hasattr(os, 'sched_setaffinity'):
+        logger.warning("CPU affinity is not supported on this platform")
+        return
+    
+    # Workers claim cores through lock files, so no two share one; a lock
+    # is released by the kernel when its worker exits
+    port = os.getenv('BACKEND_PORT', '8000')
+    for cpu in allowed_cpus():
+        lock_path = os.path.join(tempfile.gettempdir(), f"semantic-search-{port}-cpu{cpu}.lock")
+        lock_file = open(lock_path, 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            # A worker shutting down unlinks its file first; a lock taken on
+            # the unlinked file in between claims nothing
+            claimed = os.path.samestat(os.fstat(lock_file.fileno()), os.stat(lock_path))
+        except OSError:
+            claimed = False
+        if not claimed:
+            lock_file.close()
+            continue
+        _cpu_lock_file = lock_file
+        os.sched_setaffinity(0, {cpu})
+        torch.set_num_threads(1)
+        logger.info(f"Pinned worker {os.getpid()} to CPU {cpu}")
+        return
+    logger.warning(f"No free CPU for worker {os.getpid()}, leaving it unpinned")
+
+def release_worker_cpu() -> None:
+    """Remove the lock file of the core this worker claimed and release it"""
+    global _cpu_lock_file
+    if _cpu_lock_file is None:
+        return
+    # Unlink while still holding the lock, so no other worker claims the old file
+    try:
+        os.remove(_cpu_lock_file.name)
+    except OSError:
+        pass
+    _cpu_lock_file.close()
+    _cpu_lock_file = None
+
 @app.on_event("startup")
 async def startup_event():
-    """Initialize vector store on startup"""
+    """Initialize vector store and shared HTTP client on startup"""
     global vector_store
+    if os.getenv('PIN_WORKER_CPUS', 'false').lower() == 'true':
+        pin_worker_cpu()
+    app.state.http_client = create_http_client(timeout=10)
     try:
         vector_store = VectorStore(model_name="all-MiniLM-L6-v2")
         logger.info("Vector store initialized successfully")
@@ -48,6 +136,12 @@ async def startup_event():
         logger.error(f"Failed to initialize vector store: {str(e)}")
         raise
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close the shared HTTP client and give up this worker's CPU"""
+    await app.state.http_client.aclose()
+    release_worker_cpu()
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -82,8 +176,8 @@ async def search(
     Search endpoint that:
     1. Fetches HTML from the provided URL
     2. Chunks the text content (max 500 tokens per chunk)
-    3. Indexes chunks in Qdrant vector store
-    4. Performs semantic search
+    3. Embeds the chunks, indexing large pages in Qdrant (once per content hash)
+    4. Performs semantic search, in memory for typical pages and in Qdrant for large ones
     5. Returns top-k results with scores
     """
     if not vector_store:
@@ -97,8 +191,10 @@ async def search(
         
         # Step 1: Fetch and clean HTML
         try:
-            clean_text, title = fetch_and_clean_html(request.url)
-            logger.info(f"Fetched {len(clean_text)} characters from URL")
+            clean_text, title = await fetch_and_clean_html(
+                request.url, app.state.http_client
+            )
+            logger.debug("Fetched %d characters from URL", len(clean_text))
             
             if not clean_text or len(clean_text.strip()) == 0:
                 raise HTTPException(
@@ -114,10 +210,19 @@ async def search(
                 detail=f"Failed to fetch URL: {str(e)}"
             )
         
-        # Step 2: Chunk the text
+        # Step 2: Chunk the text, reusing cached chunks for content seen before
+        # Tokenizing, embedding and Qdrant calls are blocking, so they run in
+        # worker threads to keep the event loop free for other requests
+        page_hash = content_hash(clean_text, vector_store.model_id)
+        cached = await asyncio.to_thread(embedding_cache.get, page_hash)
         try:
-            chunks = chunker.chunk_text(clean_text)
-            logger.info(f"Created {len(chunks)} chunks")
+            if cached is not None:
+                chunks, embeddings, scales = cached
+                logger.debug("Loaded %d cached chunks", len(chunks))
+            else:
+                chunks = await asyncio.to_thread(chunker.chunk_text, clean_text)
+                embeddings = scales = None
+                logger.debug("Created %d chunks", len(chunks))
             
             if not chunks:
                 raise HTTPException(
@@ -133,10 +238,33 @@ async def search(
                 detail=f"Failed to process text: {str(e)}"
             )
         
-        # Step 3: Index chunks in Qdrant
+        # Step 3: Embed the chunks. Large pages are indexed in Qdrant once per
+        # content hash and searched there, so a page Qdrant already holds needs
+        # no embedding at all. Small pages are searched in memory and never
+        # touch Qdrant
+        use_qdrant = len(chunks) >= IN_MEMORY_SEARCH_MAX_CHUNKS
         try:
-            vector_store.index_chunks(chunks)
-            logger.info("Chunks indexed successfully")
+            if use_qdrant:
+                if not await asyncio.to_thread(vector_store.is_indexed, page_hash, len(chunks)):
+                    if embeddings is None:
+                        # New page: overlap encoding with the upserts
+                        embeddings = await asyncio.to_thread(
+                            vector_store.embed_and_index, chunks, page_hash
+                        )
+                    else:
+                        if scales is not None:
+                            # Qdrant stores float vectors, not the cache's int8 codes
+                            embeddings = await asyncio.to_thread(dequantize_int8, embeddings, scales)
+                        await asyncio.to_thread(
+                            vector_store.index_chunks, chunks, embeddings, page_hash
+                        )
+                    logger.info("Chunks indexed successfully")
+            elif embeddings is None:
+                embeddings = await asyncio.to_thread(
+                    vector_store.embed, [chunk['text'] for chunk in chunks]
+                )
+            if cached is None and embeddings is not None:
+                await asyncio.to_thread(embedding_cache.put, page_hash, chunks, embeddings)
         except Exception as e:
             logger.error(f"Failed to index chunks: {str(e)}")
             raise HTTPException(
@@ -144,13 +272,27 @@ async def search(
                 detail=f"Failed to index content: {str(e)}"
             )
         
-        # Step 4: Perform semantic search
+        # Step 4: Perform semantic search, answering near-duplicate queries from cache
         try:
-            results = vector_store.search(
-                query=request.query,
-                top_k=request.top_k
-            )
-            logger.info(f"Found {len(results)} results")
+            query_embedding = await asyncio.to_thread(vector_store.encode_query, request.query)
+            results = query_cache.lookup(page_hash, query_embedding, request.top_k)
+            if results is None:
+                if use_qdrant:
+                    results = await asyncio.to_thread(
+                        vector_store.search,
+                        query=request.query,
+                        top_k=request.top_k,
+                        content_hash=page_hash,
+                        query_embedding=query_embedding
+                    )
+                else:
+                    results = search_embeddings(
+                        chunks, embeddings, query_embedding, request.top_k, scales=scales
+                    )
+                query_cache.store(page_hash, query_embedding, request.top_k, results)
+            else:
+                logger.debug("Query served from semantic cache")
+            logger.debug("Found %d results", len(results))
         except Exception as e:
             logger.error(f"Search failed: {str(e)}")
             raise HTTPException(
@@ -159,24 +301,19 @@ async def search(
             )
         
         # Step 5: Format response
-
-                # Format results for Pydantic validation
+        # Build the result models directly rather than nested dicts for Pydantic to re-parse
         formatted_results = [
-                                {
-                                                    'chunk': {
-                                                                            'text': chunk['text'],
-                                                                            'start': chunk['start'],
-                                                                            'end': chunk['end']
-                                                            },
-                                                    'score': score
-                                }
-                                for chunk, score in results
-                            ]
+            SearchResultItem(
+                chunk=ChunkData(text=chunk.text, start=chunk.start, end=chunk.end),
+                score=score
+            )
+            for chunk, score in results
+        ]
         return SearchResponse(
             url=str(request.url),
             query=request.query,
-                        results=formatted_results,
-                        total_chunks=len(chunks)
+            results=formatted_results,
+            total_chunks=len(chunks)
         )
     
     except HTTPException:
@@ -191,5 +328,8 @@ async def search(
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv('BACKEND_PORT', '8000'))
-    logger.info(f"Starting server on port {port}")
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    # Embedding is CPU-bound and holds the GIL between torch calls, so scale
+    # out with one worker process per core; each worker loads its own model
+    workers = int(os.getenv('UVICORN_WORKERS', str(len(allowed_cpus()))))
+    logger.info(f"Starting server on port {port} with {workers} workers")
+    uvicorn.run("app:app", host="0.0.0.0", port=port, workers=workers)
@@ -0,0 +1,251 @@
+"""Content-addressed cache for chunked and embedded page text."""
+
+from collections import OrderedDict
+from typing import List, Dict, Tuple, Optional
+import hashlib
+import json
+import logging
+import os
+import threading
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def content_hash(text: str, model_id: str) -> str:
+    """
+    Compute the cache key for a page's cleaned text.
+
+    Args:
+        text: Cleaned page text
+        model_id: Identifier of the embedding model, so different models never share entries
+
+    Returns:
+        Hex-encoded SHA-256 digest
+    """
+    digest = hashlib.sha256()
+    digest.update(model_id.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(text.encode('utf-8'))
+    return digest.hexdigest()
+
+def quantize_int8(embeddings: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Quantize embeddings to int8 with one symmetric scale per row.
+
+    Args:
+        embeddings: Float array of shape (n, dim)
+
+    Returns:
+        Tuple of (int8 codes of shape (n, dim), float32 scales of shape (n,))
+    """
+    scales = np.abs(embeddings).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.rint(embeddings / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+def dequantize_int8(codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    """Rebuild C-contiguous float32 embeddings from quantize_int8() output."""
+    return np.multiply(codes, scales[:, None], dtype=np.float32)
+
+class EmbeddingCache:
+    """LRU cache of (chunks, embeddings) keyed by content hash, with optional on-disk tier."""
+
+    def __init__(self, max_entries: int = 128, cache_dir: Optional[str] = None, quantize: bool = False):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of pages kept in memory
+            cache_dir: Directory for persisted entries, or None to keep the cache in memory only
+            quantize: Keep embeddings put() into memory as int8 codes with per-row
+                scales, 4x smaller than float32. Hits return the codes and
+                scales unchanged for search_embeddings() to score directly.
+                Entries loaded from disk stay memory-mapped and are not quantized
+        """
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.quantize = quantize
+        # Each entry is (chunks, embeddings, scales); scales is None for float32 entries
+        self._entries: "OrderedDict[str, Tuple[List[Dict], np.ndarray, Optional[np.ndarray]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+        logger.info(
+            f"Initialized EmbeddingCache (max_entries={max_entries}, cache_dir={cache_dir}, quantize={quantize})"
+        )
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        return (
+            os.path.join(self.cache_dir, f"{key}.json"),
+            os.path.join(self.cache_dir, f"{key}.npy")
+        )
+
+    def _remember(self, key: str, chunks: List[Dict], embeddings: np.ndarray, quantize: bool = False) -> None:
+        scales = None
+        if quantize:
+            embeddings, scales = quantize_int8(embeddings)
+
+        with self._lock:
+            self._entries[key] = (chunks, embeddings, scales)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Tuple[List[Dict], np.ndarray, Optional[np.ndarray]]]:
+        """
+        Look up cached chunks and embeddings.
+
+        Args:
+            key: Content hash from content_hash()
+
+        Returns:
+            Tuple of (chunks, embeddings, scales), or None on a miss. scales is
+            None for float32 embeddings; otherwise embeddings are int8 codes
+            from quantize_int8()
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        if entry is not None:
+            return entry
+
+        if not self.cache_dir:
+            return None
+
+        chunks_path, embeddings_path = self._paths(key)
+        if not (os.path.exists(chunks_path) and os.path.exists(embeddings_path)):
+            return None
+
+        try:
+            with open(chunks_path, 'r', encoding='utf-8') as f:
+                chunks = json.load(f)
+            # Memory-map persisted embeddings read-only, so the OS page cache
+            # decides what stays resident instead of each entry being copied into RAM
+            embeddings = np.load(embeddings_path, mmap_mode='r')
+            if embeddings.dtype != np.float32 or not embeddings.flags.c_contiguous:
+                embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable cache entry {key}: {str(e)}")
+            return None
+
+        self._remember(key, chunks, embeddings)
+        return chunks, embeddings, None
+
+    def put(self, key: str, chunks: List[Dict], embeddings: np.ndarray) -> None:
+        """
+        Store chunks and embeddings for a content hash.
+
+        Args:
+            key: Content hash from content_hash()
+            chunks: Chunk dictionaries produced by TextChunker
+            embeddings: Array of shape (len(chunks), embedding_dim)
+        """
+        # Keep one C-contiguous float32 block so in-memory search is a single SGEMV
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        self._remember(key, chunks, embeddings, quantize=self.quantize)
+
+        if not self.cache_dir:
+            return
+
+        chunks_path, embeddings_path = self._paths(key)
+        try:
+            # Write to temporary files and rename, so readers that have the
+            # embeddings memory-mapped never see a truncated file
+            with open(f"{chunks_path}.tmp", 'w', encoding='utf-8') as f:
+                json.dump(chunks, f)
+            with open(f"{embeddings_path}.tmp", 'wb') as f:
+                np.save(f, embeddings)
+            os.replace(f"{embeddings_path}.tmp", embeddings_path)
+            os.replace(f"{chunks_path}.tmp", chunks_path)
+        except Exception as e:
+            logger.warning(f"Failed to persist cache entry {key}: {str(e)}")
+
+class _PageQueries:
+    """Fixed-size ring of recent queries for one page, stored column-wise."""
+
+    def __init__(self, capacity: int, dim: int):
+        self.embeddings = np.zeros((capacity, dim), dtype=np.float32)
+        self.top_ks = np.zeros(capacity, dtype=np.int32)
+        self.results: List[Optional[List]] = [None] * capacity
+        self.count = 0
+        self.next_slot = 0
+
+    def add(self, query_embedding: np.ndarray, top_k: int, results: List) -> None:
+        slot = self.next_slot
+        self.embeddings[slot] = query_embedding
+        self.top_ks[slot] = top_k
+        self.results[slot] = results
+        self.next_slot = (slot + 1) % len(self.results)
+        self.count = min(self.count + 1, len(self.results))
+
+class SemanticQueryCache:
+    """Per-page cache of search results, matched by query embedding similarity."""
+
+    def __init__(self, threshold: float = 0.97, max_pages: int = 1024, entries_per_page: int = 32):
+        """
+        Initialize the cache.
+
+        Args:
+            threshold: Minimum cosine similarity between query embeddings for a hit
+            max_pages: Maximum number of pages with cached queries, 0 disables the cache
+            entries_per_page: Number of recent queries remembered per page
+        """
+        self.threshold = threshold
+        self.max_pages = max_pages
+        self.entries_per_page = entries_per_page
+        self._pages: "OrderedDict[str, _PageQueries]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, page_key: str, query_embedding: np.ndarray, top_k: int) -> Optional[List]:
+        """
+        Find cached results for a query similar to one already answered.
+
+        Args:
+            page_key: Content hash of the searched page
+            query_embedding: L2-normalized query embedding
+            top_k: Number of results requested
+
+        Returns:
+            Cached results truncated to top_k, or None on a miss
+        """
+        with self._lock:
+            page = self._pages.get(page_key)
+            if page is None or page.count == 0:
+                return None
+            self._pages.move_to_end(page_key)
+
+            # One matrix-vector product scores every remembered query at once;
+            # entries that returned fewer results than requested cannot match
+            similarities = page.embeddings[:page.count] @ np.asarray(query_embedding, dtype=np.float32)
+            similarities[page.top_ks[:page.count] < top_k] = -np.inf
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+            return page.results[best][:top_k]
+
+    def store(self, page_key: str, query_embedding: np.ndarray, top_k: int, results: List) -> None:
+        """
+        Remember the results of a search.
+
+        Args:
+            page_key: Content hash of the searched page
+            query_embedding: L2-normalized query embedding
+            top_k: Number of results that were requested
+            results: Search results to return on later hits
+        """
+        if self.max_pages <= 0:
+            return
+
+        with self._lock:
+            page = self._pages.get(page_key)
+            if page is None:
+                page = self._pages[page_key] = _PageQueries(self.entries_per_page, len(query_embedding))
+            self._pages.move_to_end(page_key)
+            page.add(query_embedding, top_k, results)
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
@@ -1,21 +1,33 @@
 from transformers import AutoTokenizer
 from typing import List, Dict
+import functools
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@functools.lru_cache(maxsize=4)
+def _load_tokenizer(model_name: str):
+    """Load a tokenizer once per process."""
+    return AutoTokenizer.from_pretrained(model_name)
+
 class TextChunker:
     def __init__(self, model_name: str = "bert-base-uncased", max_tokens: int = 500, overlap_tokens: int = 50):
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.tokenizer = _load_tokenizer(model_name)
+        if not self.tokenizer.is_fast:
+            raise ValueError(f"TextChunker requires a fast tokenizer, got {type(self.tokenizer).__name__}")
         self.max_tokens = max_tokens
         self.overlap_tokens = overlap_tokens
         logger.info(f"Initialized TextChunker with {model_name}")
     
     def chunk_text(self, text: str) -> List[Dict[str, any]]:
-        tokens = self.tokenizer.encode(text, add_special_tokens=False)
+        # One tokenizer call yields both ids and character offsets, so chunk
+        # text is sliced from the source instead of decoded per chunk
+        encoding = self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+        tokens = encoding['input_ids']
+        offsets = encoding['offset_mapping']
         total_tokens = len(tokens)
-        logger.info(f"Total tokens: {total_tokens}")
+        logger.debug("Total tokens: %d", total_tokens)
         
         chunks = []
         start_idx = 0
@@ -23,15 +35,15 @@ class TextChunker:
         
         while start_idx < total_tokens:
             end_idx = min(start_idx + self.max_tokens, total_tokens)
-            chunk_tokens = tokens[start_idx:end_idx]
-            chunk_text = self.tokenizer.decode(chunk_tokens, skip_special_tokens=True)
+            char_start = offsets[start_idx][0]
+            char_end = offsets[end_idx - 1][1]
             
             chunks.append({
                 'chunk_index': chunk_index,
-                'text': chunk_text,
-                'start': start_idx,
-                'end': end_idx,
-                'token_count': len(chunk_tokens)
+                'text': text[char_start:char_end],
+                'start': char_start,
+                'end': char_end,
+                'token_count': end_idx - start_idx
             })
             
             chunk_index += 1
@@ -39,5 +51,5 @@ class TextChunker:
                 break
             start_idx = end_idx - self.overlap_tokens
         
-        logger.info(f"Created {len(chunks)} chunks")
+        logger.debug("Created %d chunks", len(chunks))
         return chunks
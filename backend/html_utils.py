@@ -1,45 +1,138 @@
-import requests
-from bs4 import BeautifulSoup
-from typing import Tuple
+import asyncio
+import io
+import os
+import re
+import httpx
+from lxml import etree
+from typing import Tuple, Optional
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Accept': 'text/html,application/xhtml+xml',
+}
+
+# Upper bound on downloaded page size; larger pages are rejected before parsing
+MAX_HTML_BYTES = int(os.getenv('MAX_HTML_BYTES', '5000000'))
+STREAM_CHUNK_BYTES = 65536
+
+# Elements whose text is never part of the readable page content
+SKIPPED_TAGS = ('script', 'style', 'noscript', 'iframe', 'svg', 'head')
+
+# Collapses whitespace runs in one C-level pass, without a per-token list
+_WS_RE = re.compile(r"\s+")
+
 class HTMLFetchError(Exception):
     pass
 
-def fetch_and_clean_html(url: str, timeout: int = 10) -> Tuple[str, str]:
+def create_http_client(timeout: int = 10) -> httpx.AsyncClient:
+    """Create the shared async HTTP client used for fetching pages.
+
+    Connections are pooled and kept alive between requests, and HTTP/2 is
+    negotiated where servers support it, so repeat fetches skip the TCP/TLS handshake.
+    """
+    return httpx.AsyncClient(
+        http2=True,
+        timeout=timeout,
+        headers=DEFAULT_HEADERS,
+        follow_redirects=True,
+        limits=httpx.Limits(
+            max_connections=100,
+            max_keepalive_connections=20,
+            keepalive_expiry=30
+        )
+    )
+
+def parse_html(content: bytes, encoding: Optional[str] = None) -> Tuple[str, str]:
+    """Extract visible text and title from an HTML document.
+
+    The document is parsed incrementally: skipped subtrees are dropped as soon
+    as they are complete, and each top-level body element is released once its
+    text has been collected, so peak memory tracks the largest body section
+    rather than the whole DOM.
+    """
+    context = etree.iterparse(
+        io.BytesIO(content),
+        events=('end',),
+        html=True,
+        encoding=encoding,
+        remove_comments=True
+    )
+
+    title = None
+    parts = []
+    for _, elem in context:
+        tag = elem.tag
+        if tag == 'title' and title is None:
+            title = ''.join(elem.itertext())
+
+        if tag in SKIPPED_TAGS:
+            elem.clear(keep_tail=True)
+
+        if tag == 'body':
+            # Trailing text after the last child, or the whole body text if it has none
+            parts.append(elem[-1].tail if len(elem) else elem.text)
+            elem.clear()
+            continue
+
+        parent = elem.getparent()
+        if parent is None or parent.tag != 'body':
+            continue
+
+        # Text preceding this element is complete once the element has ended
+        previous = elem.getprevious()
+        parts.append(parent.text if previous is None else previous.tail)
+        parts.extend(elem.itertext())
+
+        # Release body children whose text has already been collected
+        while elem.getprevious() is not None:
+            del parent[0]
+    del context
+
+    title = title or "Untitled"
+    text = ' '.join(part for part in parts if part)
+    text = _WS_RE.sub(' ', text).strip()
+
+    if not text or len(text) < 50:
+        raise HTMLFetchError("Extracted text is too short")
+
+    return text, title
+
+async def fetch_and_clean_html(url: str, client: httpx.AsyncClient) -> Tuple[str, str]:
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-            'Accept': 'text/html,application/xhtml+xml',
-        }
-        
-        response = requests.get(url, timeout=timeout, headers=headers)
-        response.raise_for_status()
-        
-        content_type = response.headers.get('content-type', '')
-        if 'text/html' not in content_type:
-            raise HTMLFetchError(f"URL does not return HTML: {content_type}")
-        
-        soup = BeautifulSoup(response.text, 'lxml')
-        title = soup.title.string if soup.title else "Untitled"
-        
-        for tag in soup(['script', 'style', 'noscript', 'iframe', 'svg', 'head']):
-            tag.decompose()
-        
-        body = soup.body if soup.body else soup
-        text = body.get_text(separator=' ', strip=True)
-        text = ' '.join(text.split())
-        
-        if not text or len(text) < 50:
-            raise HTMLFetchError("Extracted text is too short")
-        
-        logger.info(f"Fetched and cleaned HTML from {url}")
+        async with client.stream('GET', str(url)) as response:
+            response.raise_for_status()
+
+            content_type = response.headers.get('content-type', '')
+            if 'text/html' not in content_type:
+                raise HTMLFetchError(f"URL does not return HTML: {content_type}")
+
+            content_length = response.headers.get('content-length', '')
+            if content_length.isdigit() and int(content_length) > MAX_HTML_BYTES:
+                raise HTMLFetchError("Page exceeds max size")
+
+            # Stream the body so oversized pages are cut off without being buffered
+            content = bytearray()
+            async for part in response.aiter_bytes(STREAM_CHUNK_BYTES):
+                content.extend(part)
+                if len(content) > MAX_HTML_BYTES:
+                    raise HTMLFetchError("Page exceeds max size")
+
+        # Parsing is CPU-bound, keep it off the event loop
+        loop = asyncio.get_running_loop()
+        text, title = await loop.run_in_executor(
+            None, parse_html, bytes(content), response.charset_encoding
+        )
+
+        logger.debug("Fetched and cleaned HTML from %s", url)
         return text, title
-        
-    except requests.RequestException as e:
+
+    except HTMLFetchError:
+        raise
+    except httpx.HTTPError as e:
         raise HTMLFetchError(f"Failed to fetch URL: {str(e)}")
     except Exception as e:
         raise HTMLFetchError(f"Failed to parse HTML: {str(e)}")
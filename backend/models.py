@@ -1,13 +1,16 @@
-from pydantic import BaseModel, HttpUrl, Field, validator
+from pydantic import BaseModel, ConfigDict, HttpUrl, Field, field_validator
 from typing import List, Optional
 
 class SearchRequest(BaseModel):
     """Request model for semantic search endpoint."""
+    model_config = ConfigDict(extra='forbid', frozen=True)
+
     url: HttpUrl = Field(..., description="Target webpage URL to search")
     query: str = Field(..., min_length=1, max_length=500, description="Search query")
     top_k: int = Field(10, ge=1, le=100, description="Number of top results to return")
     
-    @validator('query')
+    @field_validator('query')
+    @classmethod
     def query_not_empty(cls, v):
         if not v.strip():
             raise ValueError('Query cannot be empty or whitespace only')
@@ -15,17 +18,23 @@ class SearchRequest(BaseModel):
 
 class ChunkData(BaseModel):
     """Chunk data structure."""
+    model_config = ConfigDict(extra='forbid', frozen=True)
+
     text: str
     start: int
     end: int
 
 class SearchResultItem(BaseModel):
     """Individual search result."""
+    model_config = ConfigDict(extra='forbid', frozen=True)
+
     chunk: ChunkData
     score: float
 
 class SearchResponse(BaseModel):
     """Response model containing search results and metadata."""
+    model_config = ConfigDict(extra='forbid', frozen=True)
+
     url: str = Field(..., description="Original search URL")
     query: str = Field(..., description="Original search query")
     total_chunks: int = Field(..., description="Total chunks indexed from page")
@@ -33,5 +42,7 @@ class SearchResponse(BaseModel):
 
 class ErrorResponse(BaseModel):
     """Error response model for failed requests."""
+    model_config = ConfigDict(extra='forbid', frozen=True)
+
     error: str
     detail: Optional[str] = None
@@ -1,8 +1,25 @@
 import pytest
+import asyncio
+import httpx
+import importlib
+import os
+import sys
+import tempfile
+import threading
+import zlib
+import torch
 from fastapi.testclient import TestClient
+from qdrant_client import QdrantClient
+from qdrant_client.models import PointStruct
+import app as app_module
 from app import app
 from chunking import TextChunker
-from vector_store import VectorStore
+import html_utils
+from html_utils import parse_html, fetch_and_clean_html, HTMLFetchError
+import vector_store
+from vector_store import VectorStore, Chunk, fit_pca, search_embeddings, search_embeddings_batch
+from cache import EmbeddingCache, SemanticQueryCache, content_hash, quantize_int8, dequantize_int8
+import numpy as np
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,6 +27,53 @@ logger = logging.getLogger(__name__)
 # Test client for FastAPI
 client = TestClient(app)
 
+class StubModel:
+    """Deterministic bag-of-words encoder standing in for SentenceTransformer"""
+    device = torch.device("cpu")
+
+    def get_sentence_embedding_dimension(self):
+        return 16
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, show_progress_bar=False, normalize_embeddings=True):
+        single = isinstance(texts, str)
+        embeddings = np.zeros((1 if single else len(texts), 16), dtype=np.float32)
+        for row, text in enumerate([texts] if single else texts):
+            for word in text.lower().split():
+                embeddings[row, zlib.crc32(word.encode()) % 16] += 1.0
+        embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings[0] if single else embeddings
+
+@pytest.fixture
+def local_store(monkeypatch):
+    """VectorStore backed by an in-process Qdrant and the stub encoder"""
+    monkeypatch.setattr(vector_store, "_load_model", lambda name, quantize="none": StubModel())
+    monkeypatch.setattr(vector_store, "QdrantClient", lambda **kwargs: QdrantClient(":memory:"))
+    # Local-mode Qdrant is not thread-safe, keep upserts on one worker thread
+    monkeypatch.setattr(vector_store, "UPSERT_PARALLELISM", 1)
+    return VectorStore()
+
+@pytest.fixture
+def other_worker(local_store):
+    """Second VectorStore sharing local_store's Qdrant, as another uvicorn worker would"""
+    worker = VectorStore()
+    worker.client = local_store.client
+    return worker
+
+@pytest.fixture
+def failing_upsert(local_store, monkeypatch):
+    """Arm local_store so its fail_on-th upsert from now raises, with retries disabled"""
+    def arm(fail_on=2):
+        monkeypatch.setattr(vector_store, "UPSERT_MAX_RETRIES", 1)
+        upsert = local_store.client.upsert
+        calls = []
+        def flaky_upsert(**kwargs):
+            calls.append(1)
+            if len(calls) == fail_on:
+                raise RuntimeError("Qdrant unavailable")
+            return upsert(**kwargs)
+        monkeypatch.setattr(local_store.client, "upsert", flaky_upsert)
+    return arm
+
 def test_root_endpoint():
     """Test the health check endpoint"""
     response = client.get("/")
@@ -19,6 +83,45 @@ def test_root_endpoint():
     assert "service" in data
     logger.info("Root endpoint test passed")
 
+def test_package_imports_from_repo_root(monkeypatch):
+    """Test the backend package imports from the repo root, without backend/ on sys.path"""
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    monkeypatch.setattr(sys, "path", [os.path.dirname(backend_dir)] + [
+        entry for entry in sys.path if os.path.abspath(entry or os.curdir) != backend_dir
+    ])
+    for name in list(sys.modules):
+        if name in ("app", "models", "html_utils", "chunking", "vector_store", "cache") or name.split(".")[0] == "backend":
+            monkeypatch.delitem(sys.modules, name)
+    package = importlib.import_module("backend")
+    assert package.app.title == "Semantic HTML Search"
+    assert package.SearchResultItem.__module__ == "backend.models"
+    assert "models" not in sys.modules
+
+@pytest.mark.skipif(not hasattr(os, "sched_setaffinity"), reason="CPU affinity is Linux-only")
+def test_workers_claim_different_cpus(tmp_path, monkeypatch):
+    """Test pinned workers claim different cores and remove their lock files on release"""
+    pinned = []
+    monkeypatch.setattr(os, "sched_getaffinity", lambda pid: {2, 5})
+    monkeypatch.setattr(os, "sched_setaffinity", lambda pid, cpus: pinned.append(cpus))
+    monkeypatch.setattr(torch, "set_num_threads", lambda threads: None)
+    monkeypatch.setattr(tempfile, "gettempdir", lambda: str(tmp_path))
+    monkeypatch.setattr(app_module, "_cpu_lock_file", None)
+
+    app_module.pin_worker_cpu()
+    first_worker = app_module._cpu_lock_file
+    app_module.pin_worker_cpu()
+    assert pinned == [{2}, {5}]
+
+    # No core is left, so a third worker stays unpinned
+    app_module.pin_worker_cpu()
+    assert pinned == [{2}, {5}]
+
+    app_module.release_worker_cpu()
+    app_module._cpu_lock_file = first_worker
+    app_module.release_worker_cpu()
+    assert app_module._cpu_lock_file is None
+    assert not list(tmp_path.iterdir())
+
 def test_chunker_basic():
     """Test basic text chunking functionality"""
     chunker = TextChunker(max_tokens=10, overlap_tokens=2)
@@ -31,6 +134,15 @@ def test_chunker_basic():
     assert all("end" in chunk for chunk in chunks)
     logger.info(f"Chunker created {len(chunks)} chunks")
 
+def test_chunker_offsets_match_source():
+    """Test that chunk text is an exact slice of the source text"""
+    chunker = TextChunker(max_tokens=10, overlap_tokens=2)
+    text = "Semantic Search finds Relevant passages in HTML pages. " * 10
+    chunks = chunker.chunk_text(text)
+
+    assert len(chunks) > 1
+    assert all(chunk["text"] == text[chunk["start"]:chunk["end"]] for chunk in chunks)
+
 def test_chunker_empty_text():
     """Test chunker with empty text"""
     chunker = TextChunker(max_tokens=500)
@@ -79,6 +191,311 @@ def test_vector_store_search():
     assert "Python" in results[0]["chunk"]["text"]
     logger.info(f"Search returned {len(results)} results")
 
+def test_partial_page_is_not_indexed(local_store, failing_upsert, monkeypatch):
+    """Test a failed upsert leaves no points and a short page is not reported as indexed"""
+    chunks = [{"text": f"chunk number {i}", "start": i, "end": i + 1} for i in range(10)]
+    page_hash = content_hash("partial page", "stub")
+
+    local_store.index_chunks(chunks[:4], content_hash=page_hash)
+    assert local_store.is_indexed(page_hash)
+    assert not local_store.is_indexed(page_hash, expected_count=len(chunks))
+
+    monkeypatch.setattr(vector_store, "UPSERT_BATCH_SIZE", 3)
+    failing_upsert(fail_on=2)
+
+    other_hash = content_hash("failing page", "stub")
+    with pytest.raises(RuntimeError):
+        local_store.index_chunks(chunks, content_hash=other_hash)
+    assert not local_store.is_indexed(other_hash)
+
+def test_expired_pages_are_purged_for_every_worker(local_store, other_worker):
+    """Test eviction state is kept in Qdrant, so all workers see the same pages"""
+    chunks = [{"text": "shared page chunk", "start": 0, "end": 17}]
+    old_hash = content_hash("old page", "stub")
+    new_hash = content_hash("new page", "stub")
+
+    other_worker.index_chunks(chunks, content_hash=old_hash)
+    assert local_store.is_indexed(old_hash, expected_count=1)
+
+    local_store.client.set_payload(
+        collection_name=local_store.collection_name,
+        payload={"last_used": 0.0},
+        points=vector_store.FilterSelector(filter=local_store._content_filter(old_hash))
+    )
+    local_store._last_purge = 0.0
+    local_store.index_chunks(chunks, content_hash=new_hash)
+
+    assert not other_worker.is_indexed(old_hash)
+    assert other_worker.is_indexed(new_hash)
+
+def test_pages_from_before_eviction_survive_the_first_purge(local_store, monkeypatch):
+    """Test a reused collection backfills last-used times and misses write nothing"""
+    legacy_hash = content_hash("legacy page", "stub")
+    local_store.client.upsert(
+        collection_name=local_store.collection_name,
+        points=[PointStruct(
+            id=1,
+            vector=local_store.embed(["legacy chunk"])[0].tolist(),
+            payload={"text": "legacy chunk", "start": 0, "end": 12, "chunk_index": 0, "content_hash": legacy_hash}
+        )]
+    )
+    local_store._ensure_collection()
+
+    local_store._last_purge = 0.0
+    local_store.index_chunks([{"text": "new chunk", "start": 0, "end": 9}], content_hash=content_hash("new page", "stub"))
+    assert local_store.is_indexed(legacy_hash, expected_count=1)
+
+    writes = []
+    monkeypatch.setattr(local_store.client, "set_payload", lambda **kwargs: writes.append(kwargs))
+    assert not local_store.is_indexed(content_hash("unseen page", "stub"))
+    assert not writes
+
+def test_embed_and_index_pipeline(local_store, failing_upsert, monkeypatch):
+    """Test pipelined embedding returns embed() output and indexes every chunk"""
+    monkeypatch.setattr(vector_store, "EMBED_PIPELINE_SLICE", 4)
+    monkeypatch.setattr(vector_store, "UPSERT_BATCH_SIZE", 3)
+    chunks = [{"text": f"pipelined chunk {i} word{i % 3}", "start": i, "end": i + 1} for i in range(11)]
+    page_hash = content_hash("pipelined page", "stub")
+
+    embeddings = local_store.embed_and_index(chunks, page_hash)
+    assert embeddings.dtype == np.float32 and embeddings.flags.c_contiguous
+    assert np.allclose(embeddings, local_store.embed([chunk["text"] for chunk in chunks]))
+    assert local_store.is_indexed(page_hash, expected_count=len(chunks))
+    results = local_store.search("pipelined chunk 5 word2", top_k=1, content_hash=page_hash)
+    assert results[0][0].text == "pipelined chunk 5 word2"
+
+    failing_upsert(fail_on=3)
+
+    failed_hash = content_hash("failed pipelined page", "stub")
+    with pytest.raises(RuntimeError):
+        local_store.embed_and_index(chunks, failed_hash)
+    assert not local_store.is_indexed(failed_hash)
+
+def test_search_batch_matches_single_searches(local_store):
+    """Test batched Qdrant search returns the same hits as one search per query"""
+    chunks = [
+        {"text": "python is used for data science", "start": 0, "end": 31},
+        {"text": "javascript runs in the browser", "start": 32, "end": 62},
+        {"text": "rust is a systems language", "start": 63, "end": 89}
+    ]
+    page_hash = content_hash("batch page", "stub")
+    local_store.index_chunks(chunks, content_hash=page_hash)
+
+    queries = ["python data science", "systems language rust"]
+    batch = local_store.search_batch(queries, top_k=2, content_hash=page_hash)
+    single = [local_store.search(query, top_k=2, content_hash=page_hash) for query in queries]
+    assert [[chunk for chunk, _ in hits] for hits in batch] == [[chunk for chunk, _ in hits] for hits in single]
+    assert batch[0][0][0].text == chunks[0]["text"]
+    assert np.allclose(local_store._encode_queries(queries)[1], local_store.encode_query(queries[1]))
+    assert local_store.search_batch([]) == []
+
+def test_search_embeddings_in_memory():
+    """Test brute-force in-memory search ranks chunks by cosine similarity"""
+    chunks = [
+        {"text": "first", "start": 0, "end": 5},
+        {"text": "second", "start": 6, "end": 12},
+        {"text": "third", "start": 13, "end": 18}
+    ]
+    embeddings = np.eye(3, dtype=np.float32)
+    query = np.array([0.1, 0.9, 0.4], dtype=np.float32)
+
+    results = search_embeddings(chunks, embeddings, query, top_k=2)
+    assert [chunk.text for chunk, _ in results] == ["second", "third"]
+    assert results[0][0] == Chunk("second", 6, 12)
+    assert len(search_embeddings(chunks, embeddings, query, top_k=10)) == 3
+
+    queries = np.stack([query, np.array([0.8, 0.1, 0.5], dtype=np.float32)])
+    batch = search_embeddings_batch(chunks, embeddings, queries, top_k=2)
+    assert batch[0] == results
+    assert [chunk.text for chunk, _ in batch[1]] == ["first", "third"]
+
+def test_fit_pca_roundtrip(tmp_path):
+    """Test fit_pca returns orthonormal components and saves a loadable projection"""
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((100, 16)).astype(np.float32)
+    path = str(tmp_path / "pca.npz")
+
+    mean, components = fit_pca(embeddings, 4, path)
+    assert mean.shape == (16,) and components.shape == (4, 16)
+    assert np.allclose(components @ components.T, np.eye(4), atol=1e-5)
+    with np.load(path) as saved:
+        assert np.array_equal(saved["components"], components)
+
+    with pytest.raises(ValueError):
+        fit_pca(embeddings[:3], 4)
+
+def test_embedding_cache_roundtrip(tmp_path):
+    """Test EmbeddingCache serves entries from memory and from disk"""
+    chunks = [{"text": "Cached chunk", "start": 0, "end": 12}]
+    embeddings = np.ones((1, 384), dtype=np.float32)
+    key = content_hash("Cached chunk", "all-MiniLM-L6-v2")
+    assert key != content_hash("Cached chunk", "another-model")
+
+    cache = EmbeddingCache(max_entries=1, cache_dir=str(tmp_path))
+    cache.put(key, chunks, embeddings)
+    assert cache.get(key)[0] == chunks
+
+    reloaded = EmbeddingCache(max_entries=1, cache_dir=str(tmp_path)).get(key)
+    assert reloaded[0] == chunks
+    assert np.array_equal(reloaded[1], embeddings)
+    assert EmbeddingCache(max_entries=1).get(key) is None
+
+def test_int8_quantization_preserves_ranking(tmp_path, monkeypatch):
+    """Test int8 codes round-trip closely and quantized cache hits are scored as int8"""
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((50, 384)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+    codes, scales = quantize_int8(embeddings)
+    assert codes.dtype == np.int8 and scales.shape == (50,)
+    restored = dequantize_int8(codes, scales)
+    assert restored.dtype == np.float32
+    assert np.abs(restored - embeddings).max() < 0.01
+
+    query = embeddings[7]
+    assert int(np.argmax(restored @ query)) == 7
+
+    chunks = [{"text": f"chunk {i}", "start": i, "end": i + 1} for i in range(50)]
+    cache = EmbeddingCache(max_entries=1, quantize=True)
+    cache.put("page", chunks, embeddings)
+    _, cached_codes, cached_scales = cache.get("page")
+    assert cached_codes.dtype == np.int8 and np.array_equal(cached_scales, scales)
+
+    # Scoring goes through the int8 path on the codes themselves, block by block
+    scored = []
+    int8_scores = vector_store._int8_scores
+    monkeypatch.setattr(vector_store, "INT8_SCORE_BLOCK_ROWS", 16)
+    monkeypatch.setattr(vector_store, "_int8_scores", lambda codes, *args: scored.append(codes.dtype) or int8_scores(codes, *args))
+    int8_results = search_embeddings(chunks, cached_codes, query, top_k=5, scales=cached_scales)
+    assert scored == [np.int8]
+    float_results = search_embeddings(chunks, embeddings, query, top_k=5)
+    assert int8_results[0][0].text == "chunk 7"
+    assert [chunk for chunk, _ in int8_results] == [chunk for chunk, _ in float_results]
+    assert np.allclose([s for _, s in int8_results], [s for _, s in float_results], atol=0.02)
+
+    # Entries read back from disk stay memory-mapped instead of being quantized
+    EmbeddingCache(max_entries=1, cache_dir=str(tmp_path)).put("page", chunks, embeddings)
+    reloaded = EmbeddingCache(max_entries=1, cache_dir=str(tmp_path), quantize=True).get("page")[1]
+    assert isinstance(reloaded, np.memmap)
+    assert np.array_equal(reloaded, embeddings)
+
+def test_semantic_query_cache():
+    """Test SemanticQueryCache hits on similar queries for the same page"""
+    cache = SemanticQueryCache(threshold=0.95)
+    query = np.array([1.0, 0.0], dtype=np.float32)
+    results = [({"text": "a", "start": 0, "end": 1}, 0.9), ({"text": "b", "start": 1, "end": 2}, 0.5)]
+    cache.store("page", query, 2, results)
+
+    near = np.array([0.99, 0.141], dtype=np.float32)
+    assert cache.lookup("page", near, 1) == results[:1]
+    assert cache.lookup("page", np.array([0.0, 1.0], dtype=np.float32), 2) is None
+    assert cache.lookup("page", query, 5) is None
+    assert cache.lookup("other-page", query, 2) is None
+
+PAGE_TEXT = "Semantic search ranks passages by meaning rather than keywords."
+
+@pytest.mark.parametrize("html, expected_text, expected_title", [
+    (
+        f"<html><head><title>Doc</title><style>p {{ color: red }}</style></head>"
+        f"<body><p>{PAGE_TEXT}</p><script>var hidden = 1;</script></body></html>",
+        PAGE_TEXT,
+        "Doc"
+    ),
+    (
+        f"<html><body><p>{PAGE_TEXT}</p><script>track()</script>Text after the script"
+        f"<noscript>Enable JS</noscript> and after noscript.</body></html>",
+        f"{PAGE_TEXT} Text after the script and after noscript.",
+        "Untitled"
+    ),
+    (
+        f"<p>{PAGE_TEXT}</p><p>Second paragraph.</p>",
+        f"{PAGE_TEXT} Second paragraph.",
+        "Untitled"
+    ),
+    (
+        f"<html><body><div>{PAGE_TEXT} <div>Inner <b>bold</b> words</div> outer tail</div>Body tail</body></html>",
+        f"{PAGE_TEXT} Inner bold words outer tail Body tail",
+        "Untitled"
+    ),
+    (
+        f"<html><body><p>{PAGE_TEXT}<p>Unclosed paragraph"
+        f"<table><tr><td>Cell one</td><td>Cell two</td></tr></table></body></html>",
+        f"{PAGE_TEXT} Unclosed paragraph Cell one Cell two",
+        "Untitled"
+    ),
+    (
+        f"<html><head><title>  Spaced   title </title></head><body>{PAGE_TEXT}</body></html>",
+        PAGE_TEXT,
+        "  Spaced   title "
+    ),
+])
+def test_parse_html(html, expected_text, expected_title):
+    """Test parse_html drops skipped tags, keeps their tails and extracts the title"""
+    assert parse_html(html.encode()) == (expected_text, expected_title)
+
+def test_parse_html_too_short():
+    """Test parse_html rejects pages with almost no readable text"""
+    with pytest.raises(HTMLFetchError):
+        parse_html(b"<html><body><p>Too short</p><script>" + b"x" * 100 + b"</script></body></html>")
+
+def fetch_with(handler):
+    """Run fetch_and_clean_html against a mock transport"""
+    async def fetch():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http_client:
+            return await fetch_and_clean_html("http://page.test/", http_client)
+    return asyncio.run(fetch())
+
+def test_fetch_and_clean_html(monkeypatch):
+    """Test pages are decoded with their charset and parsed off the event loop thread"""
+    parse_threads = []
+    monkeypatch.setattr(
+        html_utils, "parse_html",
+        lambda *args: parse_threads.append(threading.current_thread()) or parse_html(*args)
+    )
+    html = f"<html><head><title>Caf\u00e9</title></head><body><p>{PAGE_TEXT}</p></body></html>"
+    response = httpx.Response(
+        200, headers={"content-type": "text/html; charset=iso-8859-1"}, content=html.encode("iso-8859-1")
+    )
+    assert fetch_with(lambda request: response) == (PAGE_TEXT, "Caf\u00e9")
+    assert parse_threads and threading.main_thread() not in parse_threads
+
+def test_fetch_rejects_oversized_stream(monkeypatch):
+    """Test a streamed body over MAX_HTML_BYTES is cut off before it is fully read"""
+    monkeypatch.setattr(html_utils, "MAX_HTML_BYTES", 2 * html_utils.STREAM_CHUNK_BYTES)
+    sent = []
+
+    async def body():
+        for _ in range(100):
+            sent.append(1)
+            yield b"x" * html_utils.STREAM_CHUNK_BYTES
+
+    response = httpx.Response(200, headers={"content-type": "text/html"}, content=body())
+    with pytest.raises(HTMLFetchError, match="max size"):
+        fetch_with(lambda request: response)
+    assert len(sent) <= 3
+
+def test_fetch_rejects_oversized_content_length(monkeypatch):
+    """Test a Content-Length over MAX_HTML_BYTES is rejected without reading the body"""
+    monkeypatch.setattr(html_utils, "MAX_HTML_BYTES", 1000)
+    sent = []
+
+    async def body():
+        sent.append(1)
+        yield b"x" * 2000
+
+    response = httpx.Response(
+        200, headers={"content-type": "text/html", "content-length": "2000"}, content=body()
+    )
+    with pytest.raises(HTMLFetchError, match="max size"):
+        fetch_with(lambda request: response)
+    assert not sent
+
+def test_fetch_rejects_non_html():
+    """Test responses that are not HTML are rejected"""
+    response = httpx.Response(200, headers={"content-type": "application/json"}, content=b"{}")
+    with pytest.raises(HTMLFetchError, match="does not return HTML"):
+        fetch_with(lambda request: response)
+
 def test_search_endpoint_invalid_url():
     """Test search endpoint with invalid URL"""
     response = client.post(
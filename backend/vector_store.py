@@ -2,179 +2,864 @@
 
 from sentence_transformers import SentenceTransformer
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
-from typing import List, Dict, Tuple
+from qdrant_client.models import (
+    Distance, VectorParams, Batch, Filter, FieldCondition, MatchValue,
+    HnswConfigDiff, SearchParams, PayloadSchemaType, ScalarQuantization,
+    ScalarQuantizationConfig, ScalarType, QuantizationSearchParams, FilterSelector,
+    SearchRequest, Range, IsEmptyCondition, PayloadField
+)
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Tuple, Optional
+import functools
+import hashlib
 import logging
 import os
+import threading
+import time
 import uuid
+import numpy as np
+import torch
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# SentenceTransformer.encode already length-sorts its input, so each batch is
+# padded only to its own longest text; larger batches amortize per-call overhead.
+# GPUs need much larger batches than CPUs to stay busy
+ENCODE_BATCH_SIZE = 64
+ENCODE_BATCH_SIZE_CUDA = 256
+
+# Queries are short and arrive a few at a time, so they get smaller batches
+QUERY_ENCODE_BATCH_SIZE = 32
+
+# HNSW graph parameters: M links per node, candidate list size while building
+# the graph, and candidate list size while searching it
+HNSW_M = 16
+HNSW_EF_CONSTRUCT = 100
+HNSW_EF_SEARCH = 64
+
+# Stored vectors are scalar-quantized to int8; searches fetch this many times
+# top_k candidates from the quantized index and rescore them with fp32 vectors
+QUANTIZATION_OVERSAMPLING = 2.0
+
+# Large pages are upserted in batches of this many points, several in flight
+# at once, with exponential backoff when Qdrant rejects or times out a batch
+UPSERT_BATCH_SIZE = 256
+UPSERT_PARALLELISM = 4
+UPSERT_MAX_RETRIES = 3
+UPSERT_RETRY_DELAY = 0.5
+
+# embed_and_index encodes this many chunks at a time, upserting each slice
+# while the next one is being encoded
+EMBED_PIPELINE_SLICE = 1024
+
+# Content hashes whose last-used time this process remembers writing, so
+# repeat searches of a page do not rewrite its payload every time
+TOUCHED_PAGES_CACHE_SIZE = 4096
+
+# int8 cache entries are widened to float32 this many rows at a time while
+# they are scored, so no full-precision copy of the page is allocated
+INT8_SCORE_BLOCK_ROWS = 4096
+
+# Number of distinct query strings whose embeddings are kept per VectorStore
+QUERY_EMBEDDING_CACHE_SIZE = 4096
+
+# Search hit, built from references to the stored text so results are never copied
+Chunk = namedtuple('Chunk', 'text start end')
+
+# Supported EMBED_QUANTIZE modes for the embedding model weights
+QUANTIZE_MODES = ('none', 'int8', 'fp16')
+
+def _effective_quantize(mode: str) -> str:
+    """Fall back to fp32 when the requested precision is unsupported on this device."""
+    on_cuda = torch.cuda.is_available()
+    if mode == 'int8' and on_cuda:
+        logger.warning("int8 quantization is CPU only, keeping fp32 weights")
+        return 'none'
+    if mode == 'fp16' and not on_cuda:
+        logger.warning("fp16 weights require CUDA, keeping fp32 weights")
+        return 'none'
+    return mode
+
+@functools.lru_cache(maxsize=4)
+def _load_model(model_name: str, quantize: str = 'none') -> SentenceTransformer:
+    """Load a sentence transformer once per process and precision."""
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    logger.info(f"Loading embedding model {model_name} on {device} (quantize={quantize})")
+    model = SentenceTransformer(model_name, device=device)
+    # Inference only: disable dropout; encode() already runs without autograd
+    model.eval()
+    if quantize == 'int8':
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    if quantize == 'fp16':
+        return model.half()
+    return model
+
+def fit_pca(embeddings: np.ndarray, n_components: int, path: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fit a PCA projection for embeddings, to be loaded through EMBED_PCA_PATH.
+    
+    Fit on embeddings from a representative sample of pages; the projection
+    is applied to every stored and query embedding, so it should not change
+    while a collection is in use.
+    
+    Args:
+        embeddings: Sample embeddings of shape (n, embedding_dim), n >= n_components
+        n_components: Dimension of the projected embeddings
+        path: Where to save the projection as .npz, or None to only return it
+    
+    Returns:
+        Tuple of (mean of shape (embedding_dim,), components of shape (n_components, embedding_dim))
+    
+    Raises:
+        ValueError: If n_components exceeds the number of samples or the embedding dimension
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if not 0 < n_components <= min(embeddings.shape):
+        raise ValueError(
+            f"Cannot fit {n_components} components to {embeddings.shape[0]} samples "
+            f"of dimension {embeddings.shape[1]}"
+        )
+    mean = embeddings.mean(axis=0)
+    # Rows of vt are the principal axes, ordered by explained variance
+    _, _, vt = np.linalg.svd(embeddings - mean, full_matrices=False)
+    components = np.ascontiguousarray(vt[:n_components], dtype=np.float32)
+    if path:
+        np.savez(path, mean=mean, components=components)
+    return mean, components
+
+def search_embeddings(
+    chunks: List[Dict[str, any]],
+    embeddings: np.ndarray,
+    query_embedding: np.ndarray,
+    top_k: int = 10,
+    scales: Optional[np.ndarray] = None
+) -> List[Tuple[Chunk, float]]:
+    """
+    Brute-force cosine search over in-memory embeddings.
+    
+    Embeddings and query are L2-normalized, so cosine similarity is a single
+    matrix-vector product; for a single page this is cheaper than a Qdrant round trip.
+    
+    Args:
+        chunks: Chunk dictionaries aligned with the embedding rows
+        embeddings: Array of shape (len(chunks), embedding_dim), or int8 codes
+            from quantize_int8() when scales is given
+        query_embedding: Array of shape (embedding_dim,)
+        top_k: Number of top results to return
+        scales: Per-row scales of int8 embeddings, or None for float embeddings
+    
+    Returns:
+        List of tuples containing (Chunk, similarity_score)
+    """
+    if scales is not None:
+        scores = _int8_scores(embeddings, scales, query_embedding)
+    else:
+        # float32 on both sides keeps this on the single-precision BLAS path;
+        # both casts are no-ops for arrays produced by embed() and encode_query()
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        scores = embeddings @ np.asarray(query_embedding, dtype=np.float32)
+    k = min(top_k, len(scores))
+    if k == 0:
+        return []
+    
+    # Partial selection of the top k, then sort only those; partitioning
+    # the scores themselves avoids allocating a negated N-sized copy
+    n = len(scores)
+    top_indices = np.argpartition(scores, n - k)[n - k:] if k < n else np.arange(n)
+    top_indices = top_indices[np.argsort(-scores[top_indices])]
+    
+    return _format_matches(chunks, scores, top_indices)
+
+def _int8_scores(codes: np.ndarray, scales: np.ndarray, query_embedding: np.ndarray) -> np.ndarray:
+    """
+    Score int8 codes against the query quantized the same way.
+    
+    Computes codes @ query_codes * scales * query_scale. Each block of codes is
+    widened to float32 for BLAS; the int8 products are summed exactly, since
+    they stay below 2**24 for any embedding_dim up to 1040.
+    """
+    query = np.asarray(query_embedding, dtype=np.float32)
+    query_scale = float(np.abs(query).max()) / 127.0 or 1.0
+    query_codes = np.rint(query / query_scale)
+    
+    scores = np.empty(len(codes), dtype=np.float32)
+    for start in range(0, len(codes), INT8_SCORE_BLOCK_ROWS):
+        block = codes[start:start + INT8_SCORE_BLOCK_ROWS]
+        np.matmul(block.astype(np.float32), query_codes, out=scores[start:start + len(block)])
+    scores *= scales
+    scores *= query_scale
+    return scores
+
+def search_embeddings_batch(
+    chunks: List[Dict[str, any]],
+    embeddings: np.ndarray,
+    query_embeddings: np.ndarray,
+    top_k: int = 10
+) -> List[List[Tuple[Chunk, float]]]:
+    """
+    Brute-force cosine search for several queries at once.
+    
+    All queries are scored in one matrix-matrix product, which reads the
+    embeddings once instead of once per query.
+    
+    Args:
+        chunks: Chunk dictionaries aligned with the embedding rows
+        embeddings: Array of shape (len(chunks), embedding_dim)
+        query_embeddings: Array of shape (num_queries, embedding_dim)
+        top_k: Number of top results to return per query
+    
+    Returns:
+        One list of (Chunk, similarity_score) tuples per query
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    scores = np.asarray(query_embeddings, dtype=np.float32) @ embeddings.T
+    k = min(top_k, scores.shape[1])
+    if k == 0:
+        return [[] for _ in range(len(scores))]
+    
+    n = scores.shape[1]
+    if k < n:
+        top_indices = np.argpartition(scores, n - k, axis=1)[:, n - k:]
+    else:
+        top_indices = np.broadcast_to(np.arange(n), scores.shape)
+    top_scores = np.take_along_axis(scores, top_indices, axis=1)
+    top_indices = np.take_along_axis(top_indices, np.argsort(-top_scores, axis=1), axis=1)
+    
+    return [_format_matches(chunks, row, indices) for row, indices in zip(scores, top_indices)]
+
+def _format_matches(chunks: List[Dict[str, any]], scores: np.ndarray, indices: np.ndarray) -> List[Tuple[Chunk, float]]:
+    return [
+        (Chunk(chunks[idx]['text'], chunks[idx]['start'], chunks[idx]['end']), float(scores[idx]))
+        for idx in indices
+    ]
+
 class VectorStore:
     """Vector store using Qdrant for indexing and semantic search."""
     
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+    def __init__(
+        self,
+        model_name: str = "all-MiniLM-L6-v2",
+        quantize: Optional[str] = None,
+        encode_batch_size: Optional[int] = None
+    ):
         """
         Initialize the vector store with Qdrant client and sentence transformer.
         
         Args:
             model_name: Name of the sentence-transformers model to use
+            quantize: Weight precision for the model: 'none', 'int8' (dynamic
+                quantization of linear layers, CPU only) or 'fp16' (CUDA only).
+                Defaults to the EMBED_QUANTIZE environment variable.
+            encode_batch_size: Number of chunks per forward pass when indexing.
+                Defaults to the EMBED_BATCH_SIZE environment variable, or a
+                device-dependent size when that is unset.
+        
+        Raises:
+            ValueError: If the quantization mode is unknown, or the
+                EMBED_PCA_PATH projection does not match the model
         """
-        # Initialize sentence transformer model
-        self.model = SentenceTransformer(model_name)
+        mode = (quantize or os.getenv('EMBED_QUANTIZE', 'none')).lower()
+        if mode not in QUANTIZE_MODES:
+            raise ValueError(f"Unsupported quantization mode: {mode}")
+        self.quantize = _effective_quantize(mode)
+        
+        # Initialize sentence transformer model, shared across instances
+        self.model = _load_model(model_name, self.quantize)
+        # Cache keys depend on the model and its precision
+        self.model_id = model_name if self.quantize == 'none' else f"{model_name}@{self.quantize}"
         self.embedding_dim = self.model.get_sentence_embedding_dimension()
         
+        # Optional PCA projection fitted offline with fit_pca(); stored and query
+        # embeddings shrink to its dimension, and so does the collection
+        self._pca_mean = self._pca_components = None
+        pca_path = os.getenv('EMBED_PCA_PATH')
+        if pca_path:
+            with np.load(pca_path) as pca:
+                self._pca_mean = np.asarray(pca['mean'], dtype=np.float32)
+                self._pca_components = np.ascontiguousarray(pca['components'], dtype=np.float32)
+            if self._pca_components.shape[1] != self.embedding_dim:
+                raise ValueError(
+                    f"PCA projection expects {self._pca_components.shape[1]}-dim embeddings, "
+                    f"model produces {self.embedding_dim}"
+                )
+            self.embedding_dim = self._pca_components.shape[0]
+            # Cached embeddings are only valid for this exact projection
+            digest = hashlib.sha256(self._pca_mean.tobytes() + self._pca_components.tobytes()).hexdigest()[:12]
+            self.model_id = f"{self.model_id}+pca{self.embedding_dim}-{digest}"
+        default_batch_size = ENCODE_BATCH_SIZE_CUDA if self.model.device.type == 'cuda' else ENCODE_BATCH_SIZE
+        self.encode_batch_size = encode_batch_size or int(os.getenv('EMBED_BATCH_SIZE', str(default_batch_size)))
+        
         # Initialize Qdrant client
         qdrant_host = os.getenv('QDRANT_HOST', 'localhost')
         qdrant_port = int(os.getenv('QDRANT_PORT', '6333'))
+        qdrant_grpc_port = int(os.getenv('QDRANT_GRPC_PORT', '6334'))
+        # gRPC sends vectors as packed floats; REST serializes every float as JSON text
+        prefer_grpc = os.getenv('QDRANT_PREFER_GRPC', 'true').lower() == 'true'
         
-        logger.info(f"Connecting to Qdrant at {qdrant_host}:{qdrant_port}")
-        self.client = QdrantClient(host=qdrant_host, port=qdrant_port)
+        logger.info(
+            f"Connecting to Qdrant at {qdrant_host}:"
+            f"{qdrant_grpc_port if prefer_grpc else qdrant_port} ({'gRPC' if prefer_grpc else 'REST'})"
+        )
+        self.client = QdrantClient(
+            host=qdrant_host,
+            port=qdrant_port,
+            grpc_port=qdrant_grpc_port,
+            prefer_grpc=prefer_grpc
+        )
         
         # Collection name for HTML chunks
         self.collection_name = "html_chunks"
         
+        # Eviction state lives in Qdrant, shared by every worker: each point
+        # carries its page's last-used time, and pages unused for longer than
+        # indexed_page_ttl seconds are purged. _touched remembers when this
+        # process last refreshed a page, to skip redundant payload writes
+        self.indexed_page_ttl = float(os.getenv('INDEXED_PAGE_TTL_SECONDS', '86400'))
+        self._touched: "OrderedDict[str, float]" = OrderedDict()
+        self._touched_lock = threading.Lock()
+        self._last_purge = 0.0
+        
+        # Set once the collection is known to hold points, so searches skip
+        # the round trip that checks for an empty collection
+        self._has_data = False
+        
+        # Per-instance cache, so embeddings never outlive the model that produced them.
+        # functools.lru_cache is thread-safe, so the worker threads running
+        # searches can share it without an extra lock
+        self._encode_query_cached = functools.lru_cache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)(
+            self._encode_query_bytes
+        )
+        
         # Ensure collection exists
         self._ensure_collection()
         
-        logger.info(f"Initialized VectorStore with {model_name} (dim={self.embedding_dim})")
+        logger.info(
+            f"Initialized VectorStore with {model_name} (dim={self.embedding_dim}, "
+            f"device={self.model.device}, batch_size={self.encode_batch_size})"
+        )
     
     def _ensure_collection(self) -> None:
-        """Create collection if it doesn't exist, or recreate it for fresh indexing."""
+        """Create the collection if it doesn't exist, reusing a compatible existing one."""
         try:
             # Check if collection exists
             collections = self.client.get_collections().collections
             collection_exists = any(c.name == self.collection_name for c in collections)
             
             if collection_exists:
-                # Delete existing collection for fresh indexing
-                logger.info(f"Deleting existing collection: {self.collection_name}")
+                # Points are tagged by content hash, so a collection from a
+                # previous run can be reused as long as the vector size matches
+                info = self.client.get_collection(collection_name=self.collection_name)
+                if info.config.params.vectors.size == self.embedding_dim:
+                    logger.info(f"Reusing existing collection: {self.collection_name}")
+                    self._ensure_collection_config(info)
+                    return
+                logger.info(f"Deleting incompatible collection: {self.collection_name}")
                 self.client.delete_collection(collection_name=self.collection_name)
             
             # Create new collection
             logger.info(f"Creating collection: {self.collection_name}")
-            self.client.create_collection(
-                collection_name=self.collection_name,
-                vectors_config=VectorParams(
-                    size=self.embedding_dim,
-                    distance=Distance.COSINE
+            try:
+                self.client.create_collection(
+                    collection_name=self.collection_name,
+                    vectors_config=VectorParams(
+                        size=self.embedding_dim,
+                        distance=Distance.COSINE
+                    ),
+                    hnsw_config=HnswConfigDiff(m=HNSW_M, ef_construct=HNSW_EF_CONSTRUCT),
+                    quantization_config=self._quantization_config()
                 )
-            )
+            except Exception:
+                # Workers start together; another one may have just created it
+                if not self.client.collection_exists(collection_name=self.collection_name):
+                    raise
+                logger.info(f"Collection '{self.collection_name}' was created by another worker")
+                info = self.client.get_collection(collection_name=self.collection_name)
+                self._ensure_collection_config(info)
+                return
+            self._ensure_payload_indexes({})
             logger.info(f"Collection '{self.collection_name}' created successfully")
             
         except Exception as e:
             logger.error(f"Error managing collection: {str(e)}")
             raise
     
-    def index_chunks(self, chunks: List[Dict[str, any]]) -> None:
+    def _quantization_config(self) -> ScalarQuantization:
+        return ScalarQuantization(
+            scalar=ScalarQuantizationConfig(type=ScalarType.INT8, always_ram=True)
+        )
+    
+    def _ensure_collection_config(self, info) -> None:
+        """Bring a reused collection up to the index, quantization and payload settings new ones get."""
+        self._ensure_payload_indexes(info.payload_schema or {})
+        # Points written before pages expired carry no last-used time; start
+        # their TTL now rather than letting the next purge drop them all
+        self.client.set_payload(
+            collection_name=self.collection_name,
+            payload={'last_used': time.time()},
+            points=FilterSelector(filter=Filter(must=[IsEmptyCondition(is_empty=PayloadField(key='last_used'))]))
+        )
+        hnsw = info.config.hnsw_config
+        if (
+            hnsw.m != HNSW_M
+            or hnsw.ef_construct != HNSW_EF_CONSTRUCT
+            or info.config.quantization_config is None
+        ):
+            logger.info(f"Updating index settings of collection: {self.collection_name}")
+            self.client.update_collection(
+                collection_name=self.collection_name,
+                hnsw_config=HnswConfigDiff(m=HNSW_M, ef_construct=HNSW_EF_CONSTRUCT),
+                quantization_config=self._quantization_config()
+            )
+    
+    def _ensure_payload_indexes(self, payload_schema: Dict) -> None:
+        """Create the payload indexes missing from a collection."""
+        # Keyword index so per-page filters are resolved without scanning payloads,
+        # and a float index for the last-used range scans of eviction
+        for field_name, field_schema in (
+            ('content_hash', PayloadSchemaType.KEYWORD),
+            ('last_used', PayloadSchemaType.FLOAT)
+        ):
+            if field_name not in payload_schema:
+                self.client.create_payload_index(
+                    collection_name=self.collection_name,
+                    field_name=field_name,
+                    field_schema=field_schema
+                )
+    
+    def embed(self, texts: List[str]) -> np.ndarray:
         """
-        Index text chunks into Qdrant vector database.
+        Generate L2-normalized embeddings for a list of texts.
         
         Args:
-            chunks: List of chunk dictionaries with 'text', 'start', and 'end' keys
+            texts: Texts to encode
         
-        Raises:
-            ValueError: If chunks list is empty
+        Returns:
+            Contiguous float32 array of shape (len(texts), embedding_dim)
         """
-        if not chunks:
-            raise ValueError("Cannot index empty chunks")
+        logger.debug("Generating embeddings for %d chunks", len(texts))
+        embeddings = self.model.encode(
+            texts,
+            batch_size=self.encode_batch_size,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+            normalize_embeddings=True
+        )
+        return self._project(np.ascontiguousarray(embeddings, dtype=np.float32))
+    
+    def encode_query(self, query: str) -> np.ndarray:
+        """
+        Generate the L2-normalized embedding for a search query.
         
-        # Extract texts for embedding
-        texts = [chunk['text'] for chunk in chunks]
-        logger.info(f"Generating embeddings for {len(texts)} chunks")
+        Args:
+            query: Search query string
         
-        # Generate embeddings
+        Returns:
+            Read-only float32 array of shape (embedding_dim,)
+        """
+        return np.frombuffer(self._encode_query_cached(query), dtype=np.float32)
+    
+    def _encode_query_bytes(self, query: str) -> bytes:
+        """Encode a query and return its embedding as immutable bytes for caching."""
+        return self._encode_queries([query])[0].tobytes()
+    
+    def _encode_queries(self, queries: List[str]) -> np.ndarray:
+        """Encode search queries in one batched forward pass."""
+        logger.debug("Generating embeddings for %d queries", len(queries))
         embeddings = self.model.encode(
-            texts,
+            queries,
+            batch_size=QUERY_ENCODE_BATCH_SIZE,
             convert_to_numpy=True,
             show_progress_bar=False,
             normalize_embeddings=True
         )
+        return self._project(np.ascontiguousarray(embeddings, dtype=np.float32))
+    
+    def _project(self, embeddings: np.ndarray) -> np.ndarray:
+        """Apply the PCA projection, if any, and re-normalize to unit length."""
+        if self._pca_components is None:
+            return embeddings
+        projected = (embeddings - self._pca_mean) @ self._pca_components.T
+        projected /= np.maximum(np.linalg.norm(projected, axis=-1, keepdims=True), 1e-12)
+        return np.ascontiguousarray(projected, dtype=np.float32)
+    
+    def _content_filter(self, content_hash: str) -> Filter:
+        """Build a filter matching the points of a single page."""
+        return Filter(must=[
+            FieldCondition(key='content_hash', match=MatchValue(value=content_hash))
+        ])
+    
+    def _remember_touch(self, content_hash: str, timestamp: float) -> None:
+        with self._touched_lock:
+            self._touched[content_hash] = timestamp
+            self._touched.move_to_end(content_hash)
+            while len(self._touched) > TOUCHED_PAGES_CACHE_SIZE:
+                self._touched.popitem(last=False)
+    
+    def _touch(self, content_hash: str) -> None:
+        """
+        Refresh a page's last-used time in Qdrant.
         
-        # Prepare points for Qdrant
-        points = []
-        for idx, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-            point = PointStruct(
-                id=str(uuid.uuid4()),  # Generate unique ID
-                vector=embedding.tolist(),
-                payload={
-                    'text': chunk['text'],
-                    'start': chunk['start'],
-                    'end': chunk['end'],
-                    'chunk_index': idx
-                }
-            )
-            points.append(point)
+        Skipped while this process refreshed the page less than a tenth of
+        the TTL ago: the stored time is at least that recent, so the page
+        cannot be purged in between.
+        """
+        now = time.time()
+        with self._touched_lock:
+            last = self._touched.get(content_hash)
+        if last is not None and now - last < self.indexed_page_ttl / 10:
+            return
         
-        # Upsert points to Qdrant
-        logger.info(f"Upserting {len(points)} points to Qdrant")
-        self.client.upsert(
+        self.client.set_payload(
             collection_name=self.collection_name,
-            points=points
+            payload={'last_used': now},
+            points=FilterSelector(filter=self._content_filter(content_hash))
         )
+        self._remember_touch(content_hash, now)
+    
+    def _purge_expired(self) -> None:
+        """Delete pages unused for longer than the TTL, at most once per tenth of the TTL."""
+        now = time.time()
+        if now - self._last_purge < self.indexed_page_ttl / 10:
+            return
+        self._last_purge = now
+        
+        # Points without a last-used time are left alone; they are given one
+        # when their page is next searched or the collection is next reused
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=FilterSelector(filter=Filter(must=[
+                FieldCondition(key='last_used', range=Range(lt=now - self.indexed_page_ttl))
+            ]))
+        )
+    
+    def _delete_page(self, content_hash: str) -> None:
+        """Delete every point stored for a page."""
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=FilterSelector(filter=self._content_filter(content_hash))
+        )
+    
+    def is_indexed(self, content_hash: str, expected_count: Optional[int] = None) -> bool:
+        """
+        Check whether chunks for a content hash are already stored in Qdrant.
+        
+        The collection is always consulted, so pages indexed by other workers
+        or before a restart are reused.
+        
+        Args:
+            content_hash: Hash of the page's source text
+            expected_count: Number of chunks the page has; when given, a page
+                with fewer stored points counts as not indexed
+        """
+        # Always asked of Qdrant, which is shared by every worker; an exact count
+        # is cheap thanks to the content_hash keyword index
+        result = self.client.count(
+            collection_name=self.collection_name,
+            count_filter=self._content_filter(content_hash),
+            exact=True
+        )
+        if result.count == 0 or (expected_count is not None and result.count < expected_count):
+            return False
+        
+        # Refresh only pages that are stored, so the page cannot expire
+        # before the search that follows this check
+        self._touch(content_hash)
+        self._has_data = True
+        return True
+    
+    def index_chunks(
+        self,
+        chunks: List[Dict[str, any]],
+        embeddings: Optional[np.ndarray] = None,
+        content_hash: Optional[str] = None
+    ) -> None:
+        """
+        Index text chunks into Qdrant vector database.
+        
+        Args:
+            chunks: List of chunk dictionaries with 'text', 'start', and 'end' keys
+            embeddings: Precomputed embeddings for the chunks, generated if omitted
+            content_hash: Hash of the source text, stored in each payload so
+                searches can be restricted to a single page
+        
+        Raises:
+            ValueError: If chunks list is empty
+        """
+        if not chunks:
+            raise ValueError("Cannot index empty chunks")
+        
+        if embeddings is None:
+            embeddings = self.embed([chunk['text'] for chunk in chunks])
+        
+        indexed_at = time.time()
+        ids, payloads = self._point_columns(chunks, content_hash, indexed_at)
+        vectors = np.asarray(embeddings, dtype=np.float32).tolist()
+        
+        # Upsert points to Qdrant, overlapping the round trips of large pages
+        batches = [
+            Batch(
+                ids=ids[i:i + UPSERT_BATCH_SIZE],
+                vectors=vectors[i:i + UPSERT_BATCH_SIZE],
+                payloads=payloads[i:i + UPSERT_BATCH_SIZE]
+            )
+            for i in range(0, len(ids), UPSERT_BATCH_SIZE)
+        ]
+        logger.debug("Upserting %d points to Qdrant in %d batches", len(ids), len(batches))
+        try:
+            if len(batches) == 1:
+                self._upsert_batch(batches[0])
+            else:
+                with ThreadPoolExecutor(max_workers=min(UPSERT_PARALLELISM, len(batches))) as pool:
+                    list(pool.map(self._upsert_batch, batches))
+        except Exception:
+            # Never leave a partial page behind to be reused as if complete
+            if content_hash:
+                self._delete_page(content_hash)
+            raise
+        
+        self._has_data = True
+        if content_hash:
+            self._remember_touch(content_hash, indexed_at)
+        self._purge_expired()
         
         logger.info(f"Successfully indexed {len(chunks)} chunks in Qdrant")
     
-    def search(self, query: str, top_k: int = 10) -> List[Tuple[Dict, float]]:
+    def embed_and_index(
+        self,
+        chunks: List[Dict[str, any]],
+        content_hash: Optional[str] = None
+    ) -> np.ndarray:
+        """
+        Embed chunks and index them into Qdrant, overlapping the two stages.
+        
+        Chunks are encoded in slices of EMBED_PIPELINE_SLICE; each slice is
+        handed to upsert worker threads while the next one is encoded, so the
+        model is not idle during network round trips and vice versa.
+        
+        Args:
+            chunks: List of chunk dictionaries with 'text', 'start', and 'end' keys
+            content_hash: Hash of the source text, stored in each payload so
+                searches can be restricted to a single page
+        
+        Returns:
+            Contiguous float32 array of shape (len(chunks), embedding_dim)
+        
+        Raises:
+            ValueError: If chunks list is empty
+        """
+        if not chunks:
+            raise ValueError("Cannot index empty chunks")
+        
+        indexed_at = time.time()
+        ids, payloads = self._point_columns(chunks, content_hash, indexed_at)
+        texts = [chunk['text'] for chunk in chunks]
+        embeddings = np.empty((len(chunks), self.embedding_dim), dtype=np.float32)
+        
+        try:
+            with ThreadPoolExecutor(max_workers=UPSERT_PARALLELISM) as pool:
+                pending = deque()
+                for start in range(0, len(chunks), EMBED_PIPELINE_SLICE):
+                    end = min(start + EMBED_PIPELINE_SLICE, len(chunks))
+                    embeddings[start:end] = self.embed(texts[start:end])
+                    vectors = embeddings[start:end].tolist()
+                    for i in range(start, end, UPSERT_BATCH_SIZE):
+                        j = min(i + UPSERT_BATCH_SIZE, end)
+                        batch = Batch(ids=ids[i:j], vectors=vectors[i - start:j - start], payloads=payloads[i:j])
+                        pending.append(pool.submit(self._upsert_batch, batch))
+                    # Bound the batches waiting on the network, so encoding
+                    # never runs more than a couple of slices ahead
+                    while len(pending) > 2 * UPSERT_PARALLELISM:
+                        pending.popleft().result()
+                for future in pending:
+                    future.result()
+        except Exception:
+            # Leaving the with block waited for in-flight upserts, so none can
+            # land after the delete; never leave a partial page behind
+            if content_hash:
+                self._delete_page(content_hash)
+            raise
+        
+        self._has_data = True
+        if content_hash:
+            self._remember_touch(content_hash, indexed_at)
+        self._purge_expired()
+        
+        logger.info(f"Embedded and indexed {len(chunks)} chunks in Qdrant")
+        return embeddings
+    
+    def _point_columns(
+        self,
+        chunks: List[Dict[str, any]],
+        content_hash: Optional[str],
+        indexed_at: float
+    ) -> Tuple[List[int], List[Dict]]:
+        """Build point IDs and payloads column-wise, once per page rather than per point."""
+        # Integer point IDs from one consecutive range per page: the base comes
+        # from 60 bits of the content hash (deterministic, so re-indexing the
+        # same content is idempotent) or from a single random UUID, leaving
+        # room for any page size below Qdrant's uint64 limit
+        if content_hash:
+            base = int(content_hash[:15], 16)
+        else:
+            base = uuid.uuid4().int >> 68
+        ids = list(range(base, base + len(chunks)))
+        payloads = [
+            {
+                'text': chunk['text'],
+                'start': chunk['start'],
+                'end': chunk['end'],
+                'chunk_index': idx,
+                'content_hash': content_hash,
+                'last_used': indexed_at
+            }
+            for idx, chunk in enumerate(chunks)
+        ]
+        return ids, payloads
+    
+    def _upsert_batch(self, batch: Batch) -> None:
+        """Upsert one batch of points, retrying with exponential backoff."""
+        for attempt in range(UPSERT_MAX_RETRIES):
+            try:
+                self.client.upsert(collection_name=self.collection_name, points=batch)
+                return
+            except Exception as e:
+                if attempt == UPSERT_MAX_RETRIES - 1:
+                    raise
+                delay = UPSERT_RETRY_DELAY * (2 ** attempt)
+                logger.warning(f"Upsert failed ({str(e)}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+    
+    def search(
+        self,
+        query: str,
+        top_k: int = 10,
+        content_hash: Optional[str] = None,
+        query_embedding: Optional[np.ndarray] = None
+    ) -> List[Tuple[Chunk, float]]:
         """
         Perform semantic search using Qdrant vector database.
         
         Args:
             query: Search query string
             top_k: Number of top results to return
+            content_hash: Restrict results to chunks indexed under this hash
+            query_embedding: Precomputed embedding for the query, generated if omitted
         
         Returns:
-            List of tuples containing (chunk_dict, similarity_score)
+            List of tuples containing (Chunk, similarity_score)
         
         Raises:
             ValueError: If vector store is not indexed
         """
-        # Check if collection has data
-        try:
-            collection_info = self.client.get_collection(collection_name=self.collection_name)
-            if collection_info.points_count == 0:
-                raise ValueError("Vector store not indexed - no points in collection")
-        except Exception as e:
-            logger.error(f"Error checking collection: {str(e)}")
-            raise ValueError("Vector store not indexed")
+        self._require_data()
         
-        # Generate query embedding
-        logger.info(f"Generating embedding for query: '{query}'")
-        query_embedding = self.model.encode(
-            query,
-            convert_to_numpy=True,
-            normalize_embeddings=True
-        )
+        if query_embedding is None:
+            query_embedding = self.encode_query(query)
         
         # Search in Qdrant
-        logger.info(f"Searching for top {top_k} results")
+        query_filter = self._content_filter(content_hash) if content_hash else None
+        
         search_results = self.client.search(
             collection_name=self.collection_name,
-            query_vector=query_embedding.tolist(),
+            # Writable copy: the cached embedding is read-only and clients may normalize in place
+            query_vector=np.array(query_embedding, dtype=np.float32),
+            query_filter=query_filter,
+            search_params=self._search_params(top_k),
             limit=top_k
         )
         
-        # Format results
-        results = []
-        for result in search_results:
-            chunk = {
-                'text': result.payload['text'],
-                'start': result.payload['start'],
-                'end': result.payload['end']
-            }
-            score = float(result.score)
-            results.append((chunk, score))
-        
-        logger.info(f"Search returned {len(results)} results")
+        results = self._format_points(search_results)
+        logger.debug("Search returned %d of top %d results", len(results), top_k)
         return results
     
+    def search_batch(
+        self,
+        queries: List[str],
+        top_k: int = 10,
+        content_hash: Optional[str] = None,
+        query_embeddings: Optional[np.ndarray] = None
+    ) -> List[List[Tuple[Chunk, float]]]:
+        """
+        Perform semantic search for several queries in one Qdrant request.
+        
+        Queries are embedded in a single batched forward pass and sent together,
+        instead of one model call and one round trip per query.
+        
+        Args:
+            queries: Search query strings
+            top_k: Number of top results to return per query
+            content_hash: Restrict results to chunks indexed under this hash
+            query_embeddings: Precomputed query embeddings, generated if omitted
+        
+        Returns:
+            One list of (Chunk, similarity_score) tuples per query
+        
+        Raises:
+            ValueError: If vector store is not indexed
+        """
+        if not queries:
+            return []
+        
+        self._require_data()
+        
+        if query_embeddings is None:
+            query_embeddings = self._encode_queries(queries)
+        
+        query_filter = self._content_filter(content_hash) if content_hash else None
+        search_params = self._search_params(top_k)
+        batch_results = self.client.search_batch(
+            collection_name=self.collection_name,
+            requests=[
+                SearchRequest(
+                    vector=vector,
+                    filter=query_filter,
+                    params=search_params,
+                    limit=top_k,
+                    with_payload=True
+                )
+                for vector in np.asarray(query_embeddings, dtype=np.float32).tolist()
+            ]
+        )
+        
+        logger.debug("Batch search answered %d queries", len(queries))
+        return [self._format_points(points) for points in batch_results]
+    
+    def _require_data(self) -> None:
+        """Raise ValueError for an empty collection, checking only until it is first seen non-empty."""
+        if not self._has_data:
+            self._has_data = self.client.count(
+                collection_name=self.collection_name, exact=False
+            ).count > 0
+            if not self._has_data:
+                raise ValueError("Vector store not indexed - no points in collection")
+    
+    def _search_params(self, top_k: int) -> SearchParams:
+        return SearchParams(
+            # The candidate list must hold at least top_k entries to return top_k results
+            hnsw_ef=max(HNSW_EF_SEARCH, top_k),
+            quantization=QuantizationSearchParams(
+                rescore=True,
+                oversampling=QUANTIZATION_OVERSAMPLING
+            )
+        )
+    
+    def _format_points(self, points) -> List[Tuple[Chunk, float]]:
+        return [
+            (Chunk(point.payload['text'], point.payload['start'], point.payload['end']), float(point.score))
+            for point in points
+        ]
+    
     def clear(self) -> None:
         """Clear all data from the vector store."""
         try:
             logger.info(f"Clearing collection: {self.collection_name}")
             self.client.delete_collection(collection_name=self.collection_name)
             self._ensure_collection()
+            with self._touched_lock:
+                self._touched.clear()
+            self._has_data = False
             logger.info("Vector store cleared")
         except Exception as e:
             logger.error(f"Error clearing vector store: {str(e)}")
@@ -184,11 +869,17 @@ class VectorStore:
         """Get statistics about the vector store."""
         try:
             collection_info = self.client.get_collection(collection_name=self.collection_name)
+            query_cache = self._encode_query_cached.cache_info()
             return {
                 'collection_name': self.collection_name,
                 'points_count': collection_info.points_count,
                 'embedding_dim': self.embedding_dim,
-                'distance_metric': 'cosine'
+                'distance_metric': 'cosine',
+                'query_cache': {
+                    'hits': query_cache.hits,
+                    'misses': query_cache.misses,
+                    'size': query_cache.currsize
+                }
             }
         except Exception as e:
             logger.error(f"Error getting stats: {str(e)}")